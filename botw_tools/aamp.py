@@ -1,9 +1,11 @@
 import argparse
 from pathlib import Path
+from typing import Any, Dict, List, Union
 
 import oead
 
 from .common import read, write
+from .diff import build, compare, write_changes
 
 
 def guess_dst(_aamp: bool, dst: Path) -> Path:
@@ -21,6 +23,12 @@ def guess_dst(_aamp: bool, dst: Path) -> Path:
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Convert between AAMP and YML")
 
+    parser.add_argument(
+        "-d",
+        "--diff",
+        action="store_true",
+        help="List differences between src and dst by path instead of converting",
+    )
     parser.add_argument(
         "src",
         type=Path,
@@ -31,7 +39,7 @@ def parse_args() -> argparse.Namespace:
         "dst",
         type=Path,
         nargs="?",
-        help="Destination AAMP or YML file (writes to stdout if empty or '-', '!!' to guess filename)",
+        help="Destination AAMP or YML file (writes to stdout if empty or '-', '!!' to guess filename, file to compare with when using --diff)",
     )
 
     return parser.parse_args()
@@ -51,8 +59,86 @@ def yml_to_aamp(args: argparse.Namespace, data: bytes) -> None:
     return
 
 
+def load_aamp(data: bytes) -> oead.aamp.ParameterIO:
+    if data[:4] == b"AAMP":
+        # noinspection PyArgumentList
+        return oead.aamp.ParameterIO.from_binary(data)
+
+    if data[:3] == b"!io":
+        # noinspection PyArgumentList
+        return oead.aamp.ParameterIO.from_text(data.decode("utf-8"))
+
+    raise SystemExit("Invalid file")
+
+
+def aamp_name(name: oead.aamp.Name) -> str:
+    return oead.aamp.get_default_name_table().get_name(name.hash, 0, 0) or str(
+        name.hash
+    )
+
+
+def aamp_children(value: Any) -> Union[None, List[Any], Dict[Any, Any]]:
+    if isinstance(value, oead.aamp.ParameterList):
+        return {"lists": value.lists, "objects": value.objects}
+
+    if isinstance(value, oead.aamp.ParameterObject):
+        return {aamp_name(k): v for k, v in value.params.items()}
+
+    if isinstance(value, (oead.aamp.ParameterListMap, oead.aamp.ParameterObjectMap)):
+        return {aamp_name(k): v for k, v in value.items()}
+
+    return None
+
+
+# Fields of the parameter values that don't have a repr of their own
+AAMP_FIELDS = {
+    oead.Vector2f: ("x", "y"),
+    oead.Vector3f: ("x", "y", "z"),
+    oead.Vector4f: ("x", "y", "z", "t"),
+    oead.Color4f: ("r", "g", "b", "a"),
+    oead.Quatf: ("a", "b", "c", "d"),
+    oead.Curve: ("a", "b", "floats"),
+}
+
+
+def aamp_value_text(value: Any) -> str:
+    if isinstance(value, list):
+        return f"[{', '.join(aamp_value_text(v) for v in value)}]"
+
+    if type(value) in AAMP_FIELDS:
+        fields = ", ".join(
+            f"{f}={aamp_value_text(getattr(value, f))}"
+            for f in AAMP_FIELDS[type(value)]
+        )
+        return f"{type(value).__name__}({fields})"
+
+    return repr(value)
+
+
+def aamp_text(value: Any) -> str:
+    if isinstance(value, oead.aamp.Parameter):
+        return aamp_value_text(value.v)
+
+    return type(value).__name__
+
+
+def aamp_diff(args: argparse.Namespace) -> None:
+    if not args.dst or args.dst.name in ("-", "!!"):
+        raise SystemExit("You have to specify a file to compare with")
+
+    a = build(load_aamp(read(src=args.src)), "", aamp_children, aamp_text)
+    b = build(load_aamp(read(src=args.dst)), "", aamp_children, aamp_text)
+
+    write_changes(compare(a, b), aamp_text)
+    return
+
+
 def main() -> None:
     args = parse_args()
+
+    if args.diff:
+        return aamp_diff(args)
+
     data = read(src=args.src)
 
     if data[:4] == b"AAMP":
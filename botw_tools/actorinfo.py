@@ -1,12 +1,14 @@
 import argparse
 import bisect
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 from zlib import crc32
 
 import oead
 
+from .byml import byml_children, byml_text
 from .common import read, write, write_stdout
+from .diff import Node, build, compare, make_node, write_changes
 
 
 def convert_hash(x: int) -> Union[oead.S32, oead.U32]:
@@ -27,86 +29,98 @@ def duplicate_entry(entry: Union[oead.byml.Array, oead.byml.Hash]):
     return entry
 
 
-def actorinfo_get(args: argparse.Namespace) -> None:
-    actorinfo = read_actorinfo(args)
-    entry_hash = crc32(args.entry_name.encode())
+def get_entry_index(actorinfo: oead.byml.Hash, entry_name: str) -> int:
+    entry_hash = crc32(entry_name.encode())
 
     if convert_hash(entry_hash) not in actorinfo["Hashes"]:
-        raise SystemExit(f"'{args.entry_name}' doesn't exist in this file")
+        raise SystemExit(f"'{entry_name}' doesn't exist in this file")
 
-    entry_index = list(actorinfo["Hashes"]).index(
+    return list(actorinfo["Hashes"]).index(
         oead.U32(entry_hash) if entry_hash > 0x80000000 else oead.S32(entry_hash)
     )
 
-    entry = actorinfo["Actors"][entry_index]
+
+def entry_get(actorinfo: oead.byml.Hash, entry_name: str, key: Optional[str]) -> str:
+    entry = actorinfo["Actors"][get_entry_index(actorinfo, entry_name)]
 
     try:
-        write_stdout(
-            oead.byml.to_text(entry[args.key] if args.key else entry).encode("utf-8")
-        )
-        return
+        return oead.byml.to_text(entry[key] if key else entry)
     except KeyError:
-        raise SystemExit(f"Key '{args.key}' doesn't exist in '{args.entry_name}'")
+        raise SystemExit(f"Key '{key}' doesn't exist in '{entry_name}'")
 
 
-def actorinfo_duplicate(args: argparse.Namespace) -> None:
-    actorinfo = read_actorinfo(args)
-
-    entry_hash_from = crc32(args.entry_name_from.encode())
-
-    if convert_hash(entry_hash_from) not in actorinfo["Hashes"]:
-        raise SystemExit(f"'{args.entry_name_from}' doesn't exist in this file")
-
-    entry_index_from = list(actorinfo["Hashes"]).index(
-        oead.U32(entry_hash_from)
-        if entry_hash_from > 0x80000000
-        else oead.S32(entry_hash_from)
+def entry_duplicate(
+    actorinfo: oead.byml.Hash, entry_name_from: str, entry_name_to: str
+) -> str:
+    entry = duplicate_entry(
+        actorinfo["Actors"][get_entry_index(actorinfo, entry_name_from)]
     )
+    entry["name"] = entry_name_to
 
-    entry = duplicate_entry(actorinfo["Actors"][entry_index_from])
-    entry["name"] = args.entry_name_to
-
-    entry_hash_to = crc32(args.entry_name_to.encode())
+    entry_hash_to = crc32(entry_name_to.encode())
 
     if convert_hash(entry_hash_to) in actorinfo["Hashes"]:
-        raise SystemExit(f"'{args.entry_name_to}' already exists")
+        raise SystemExit(f"'{entry_name_to}' already exists")
 
     entry_index_to = bisect.bisect([int(x) for x in actorinfo["Hashes"]], entry_hash_to)
     actorinfo["Hashes"].insert(entry_index_to, convert_hash(entry_hash_to))
     actorinfo["Actors"].insert(entry_index_to, entry)
 
-    write_stdout(
-        f"{args.entry_name_from} -> {args.entry_name_to}".encode("utf-8")
-    ) if args.actorinfo and args.actorinfo.name != "-" else None
-    write_actorinfo(args, actorinfo)
-    return
+    return f"{entry_name_from} -> {entry_name_to}"
 
 
-def actorinfo_edit(args: argparse.Namespace) -> None:
-    actorinfo = read_actorinfo(args)
+def entry_edit(actorinfo: oead.byml.Hash, entry_name: str, key: str, value) -> str:
+    entry = actorinfo["Actors"][get_entry_index(actorinfo, entry_name)]
 
-    entry_hash = crc32(args.entry_name.encode())
+    try:
+        value_before = entry[key]
+    except KeyError:
+        value_before = None
+    entry[key] = value
+    value_after = entry[key]
 
-    if convert_hash(entry_hash) not in actorinfo["Hashes"]:
-        raise SystemExit(f"'{args.entry_name}' doesn't exist in this file")
+    return f"{entry_name}['{key}']: '{value_before}' -> '{value_after}'"
 
-    entry_index = list(actorinfo["Hashes"]).index(
-        oead.U32(entry_hash) if entry_hash > 0x80000000 else oead.S32(entry_hash)
-    )
 
-    entry = actorinfo["Actors"][entry_index]
+def entry_remove(actorinfo: oead.byml.Hash, entry_name: str, key: Optional[str]) -> str:
+    entry_index = get_entry_index(actorinfo, entry_name)
+
+    if not key:
+        actorinfo["Hashes"].pop(entry_index)
+        actorinfo["Actors"].pop(entry_index)
+        return f"{entry_name} removed"
 
     try:
-        value_before = entry[args.key]
+        del actorinfo["Actors"][entry_index][key]
     except KeyError:
-        value_before = None
-    entry[args.key] = args.value
-    value_after = entry[args.key]
+        raise SystemExit(f"Key '{key}' doesn't exist in '{entry_name}'")
+
+    return f"{entry_name}['{key}'] removed"
+
+
+def actorinfo_get(args: argparse.Namespace) -> None:
+    actorinfo = read_actorinfo(args)
+    write_stdout(entry_get(actorinfo, args.entry_name, args.key).encode("utf-8"))
+    return
+
+
+def actorinfo_duplicate(args: argparse.Namespace) -> None:
+    actorinfo = read_actorinfo(args)
+    msg = entry_duplicate(actorinfo, args.entry_name_from, args.entry_name_to)
 
     write_stdout(
-        f"{args.entry_name}['{args.key}']: '{value_before}' -> '{value_after}'".encode(
-            "utf-8"
-        )
+        msg.encode("utf-8")
+    ) if args.actorinfo and args.actorinfo.name != "-" else None
+    write_actorinfo(args, actorinfo)
+    return
+
+
+def actorinfo_edit(args: argparse.Namespace) -> None:
+    actorinfo = read_actorinfo(args)
+    msg = entry_edit(actorinfo, args.entry_name, args.key, args.value)
+
+    write_stdout(
+        msg.encode("utf-8")
     ) if args.actorinfo and args.actorinfo.name != "-" else None
     write_actorinfo(args, actorinfo)
     return
@@ -114,38 +128,42 @@ def actorinfo_edit(args: argparse.Namespace) -> None:
 
 def actorinfo_remove(args: argparse.Namespace) -> None:
     actorinfo = read_actorinfo(args)
+    msg = entry_remove(actorinfo, args.entry_name, args.key)
 
-    entry_hash = crc32(args.entry_name.encode())
+    write_stdout(
+        msg.encode("utf-8")
+    ) if args.actorinfo and args.actorinfo.name != "-" else None
+    write_actorinfo(args, actorinfo)
+    return
 
-    if convert_hash(entry_hash) not in actorinfo["Hashes"]:
-        raise SystemExit(f"'{args.entry_name}' doesn't exist in this file")
 
-    entry_index = list(actorinfo["Hashes"]).index(
-        oead.U32(entry_hash) if entry_hash > 0x80000000 else oead.S32(entry_hash)
+def hash_entries(actorinfo: oead.byml.Hash) -> Node:
+    # Entries are matched by their name hash instead of their position
+    return make_node(
+        actorinfo,
+        "",
+        {
+            int(h): build(entry, str(entry["name"]), byml_children)
+            for h, entry in zip(actorinfo["Hashes"], actorinfo["Actors"])
+        },
     )
 
-    if not args.key:
-        actorinfo["Hashes"].pop(entry_index)
-        actorinfo["Actors"].pop(entry_index)
-        msg = f"{args.entry_name} removed".encode("utf-8")
-    else:
-        try:
-            del actorinfo["Actors"][entry_index][args.key]
-        except KeyError:
-            raise SystemExit(f"Key '{args.key}' doesn't exist in '{args.entry_name}'")
-        msg = f"{args.entry_name}['{args.key}'] removed".encode("utf-8")
-
-    write_stdout(msg) if args.actorinfo and args.actorinfo.name != "-" else None
-    write_actorinfo(args, actorinfo)
+
+def actorinfo_diff(args: argparse.Namespace) -> None:
+    if args.other.name == "-" and args.actorinfo.name == "-":
+        raise SystemExit("You cannot pipe in both files")
+
+    a = hash_entries(read_actorinfo(args))
+    b = hash_entries(parse_actorinfo(argparse.Namespace(), read(src=args.other)))
+
+    write_changes(compare(a, b), byml_text)
     return
 
 
-def read_actorinfo(args: argparse.Namespace) -> oead.byml.Hash:
+def parse_actorinfo(args: argparse.Namespace, data: bytes) -> oead.byml.Hash:
     args.yaz0 = False
     args.binary = False
 
-    data = read(src=args.actorinfo)
-
     if data[:4] == b"Yaz0":
         data = oead.yaz0.decompress(data)
         args.yaz0 = True
@@ -166,15 +184,28 @@ def read_actorinfo(args: argparse.Namespace) -> oead.byml.Hash:
     return actorinfo
 
 
-def write_actorinfo(args: argparse.Namespace, actorinfo: oead.byml.Hash) -> int:
+def read_actorinfo(args: argparse.Namespace) -> oead.byml.Hash:
+    return parse_actorinfo(args, read(src=args.actorinfo))
+
+
+def dump_actorinfo(args: argparse.Namespace, actorinfo: oead.byml.Hash) -> bytes:
     data = (
         oead.byml.to_binary(actorinfo, args.big_endian)
         if args.binary
         else oead.byml.to_text(actorinfo).encode("utf-8")
     )
-    data = oead.yaz0.compress(data) if args.yaz0 else data
 
-    return write(data=data, src=None, dst=args.actorinfo, condition=None, function=None)
+    return oead.yaz0.compress(data) if args.yaz0 else data
+
+
+def write_actorinfo(args: argparse.Namespace, actorinfo: oead.byml.Hash) -> int:
+    return write(
+        data=dump_actorinfo(args, actorinfo),
+        src=None,
+        dst=args.actorinfo,
+        condition=None,
+        function=None,
+    )
 
 
 def parse_args() -> argparse.Namespace:
@@ -227,6 +258,14 @@ def parse_args() -> argparse.Namespace:
     )
     subparser_remove.set_defaults(func=actorinfo_remove)
 
+    subparser_diff = subparsers.add_parser(
+        "diff", help="List differences between two ActorInfo files", aliases=["df"]
+    )
+    subparser_diff.add_argument(
+        "other", type=Path, help="ActorInfo to compare with (reads from stdin if '-')"
+    )
+    subparser_diff.set_defaults(func=actorinfo_diff)
+
     return parser.parse_args()
 
 
@@ -0,0 +1,402 @@
+import argparse
+from pathlib import Path
+from typing import List, Optional, Union
+
+import oead
+
+from .actorinfo import (
+    dump_actorinfo,
+    entry_duplicate,
+    entry_edit,
+    entry_get,
+    entry_remove,
+    parse_actorinfo,
+)
+from .common import read, write, write_stdout
+from .sarc import (
+    create_files,
+    extract_files,
+    list_files,
+    parse_sarc,
+    remove_files,
+    update_from,
+)
+
+# Intermediate results are passed between steps as-is, they only get
+# serialized when the next step (or the final output) needs raw bytes
+Value = Union[bytes, oead.Bytes, oead.Sarc, oead.SarcWriter, oead.byml.Hash]
+
+
+def as_bytes(ctx: argparse.Namespace, value: Value) -> bytes:
+    if isinstance(value, oead.SarcWriter):
+        return value.write()[1]
+
+    if isinstance(value, oead.Sarc):
+        # noinspection PyArgumentList
+        return oead.SarcWriter.from_sarc(value).write()[1]
+
+    if isinstance(value, oead.byml.Hash):
+        # Compression is left to the 'yaz' and 'unyaz' steps, only the final
+        # output keeps the compression of the ActorInfo that was read
+        return dump_actorinfo(argparse.Namespace(**{**vars(ctx), "yaz0": False}), value)
+
+    return value
+
+
+def as_sarc(ctx: argparse.Namespace, value: Value) -> oead.Sarc:
+    return value if isinstance(value, oead.Sarc) else parse_sarc(as_bytes(ctx, value))
+
+
+def as_sarc_writer(ctx: argparse.Namespace, value: Value) -> oead.SarcWriter:
+    if isinstance(value, oead.SarcWriter):
+        return value
+
+    # noinspection PyArgumentList
+    return oead.SarcWriter.from_sarc(as_sarc(ctx, value))
+
+
+def as_actorinfo(ctx: argparse.Namespace, value: Value) -> oead.byml.Hash:
+    if isinstance(value, oead.byml.Hash):
+        return value
+
+    return parse_actorinfo(ctx, as_bytes(ctx, value))
+
+
+def log(ctx: argparse.Namespace, msg: str) -> None:
+    write_stdout(f"{msg}\n".encode("utf-8")) if ctx.verbose else None
+    return
+
+
+def step_unyaz(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    data = as_bytes(ctx, value)
+
+    if data[:4] != b"Yaz0":
+        raise SystemExit("Input of 'unyaz' is not Yaz-0 compressed")
+
+    return oead.yaz0.decompress(data)
+
+
+def step_yaz(ctx: argparse.Namespace, step: argparse.Namespace, value: Value) -> Value:
+    return oead.yaz0.compress(as_bytes(ctx, value))
+
+
+def step_sarc_create(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Path
+) -> Value:
+    sarc = create_files(value, step.big_endian)
+    [log(ctx, f) for f in sarc.files]
+    return sarc
+
+
+def step_sarc_extract(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> None:
+    if step.folder.name in ("-", "!!"):
+        raise SystemExit("Destination directory must be specified in a pipeline")
+
+    extract_files(as_sarc(ctx, value), step.folder, step.simple)
+    return
+
+
+def step_sarc_list(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    listing = list_files(as_sarc(ctx, value), step.hide_sizes)
+
+    if not listing:
+        raise SystemExit(f"No files inside '{ctx.name}'")
+
+    return listing.encode("utf-8")
+
+
+def step_sarc_update(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    if step.folder.name == "-":
+        raise SystemExit("You cannot pipe in a folder")
+
+    sarc = as_sarc_writer(ctx, value)
+    update_from(sarc, step.folder, ctx.verbose)
+    return sarc
+
+
+def step_sarc_remove(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    if "-" in step.files:
+        raise SystemExit("You cannot pipe in filenames to remove")
+
+    sarc = as_sarc_writer(ctx, value)
+    remove_files(sarc, step.files, ctx.verbose)
+    return sarc
+
+
+def step_byml_to_yml(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    if isinstance(value, oead.byml.Hash):
+        return oead.byml.to_text(value).encode("utf-8")
+
+    data = as_bytes(ctx, value)
+    data = oead.yaz0.decompress(data) if data[:4] == b"Yaz0" else data
+
+    if data[:2] not in (b"BY", b"YB"):
+        raise SystemExit("Input of 'byml_to_yml' is not a BYML file")
+
+    return oead.byml.to_text(oead.byml.from_binary(data)).encode("utf-8")
+
+
+def step_yml_to_byml(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    if isinstance(value, oead.byml.Hash):
+        return oead.byml.to_binary(value, step.big_endian)
+
+    return oead.byml.to_binary(
+        oead.byml.from_text(bytes(as_bytes(ctx, value)).decode("utf-8")),
+        step.big_endian,
+    )
+
+
+def step_actorinfo_get(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    actorinfo = as_actorinfo(ctx, value)
+    return entry_get(actorinfo, step.entry_name, step.key).encode("utf-8")
+
+
+def step_actorinfo_duplicate(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    actorinfo = as_actorinfo(ctx, value)
+    log(ctx, entry_duplicate(actorinfo, step.entry_name_from, step.entry_name_to))
+    return actorinfo
+
+
+def step_actorinfo_edit(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    actorinfo = as_actorinfo(ctx, value)
+    log(ctx, entry_edit(actorinfo, step.entry_name, step.key, step.value))
+    return actorinfo
+
+
+def step_actorinfo_remove(
+    ctx: argparse.Namespace, step: argparse.Namespace, value: Value
+) -> Value:
+    actorinfo = as_actorinfo(ctx, value)
+    log(ctx, entry_remove(actorinfo, step.entry_name, step.key))
+    return actorinfo
+
+
+def step_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="botw STEP", description="Pipeline step")
+
+    subparsers = parser.add_subparsers(dest="step", help="Step")
+    subparsers.required = True
+
+    subparser_unyaz = subparsers.add_parser("unyaz", help="Decompress using Yaz-0")
+    subparser_unyaz.set_defaults(func=step_unyaz)
+
+    subparser_yaz = subparsers.add_parser("yaz", help="Compress using Yaz-0")
+    subparser_yaz.set_defaults(func=step_yaz)
+
+    subparser_sarc_create = subparsers.add_parser(
+        "sarc_create",
+        help="Create a SARC archive from the source folder (must be the first step)",
+    )
+    subparser_sarc_create.add_argument(
+        "-b", "--big_endian", action="store_true", help="Use big endian (Wii U)"
+    )
+    subparser_sarc_create.set_defaults(func=step_sarc_create)
+
+    subparser_sarc_extract = subparsers.add_parser(
+        "sarc_extract", help="Extract SARC archive (must be the last step)"
+    )
+    subparser_sarc_extract.add_argument("folder", type=Path, help="Destination folder")
+    subparser_sarc_extract.add_argument(
+        "-s",
+        "--simple",
+        action="store_true",
+        help="Simplified output (without 'Written' and ''')",
+    )
+    subparser_sarc_extract.set_defaults(func=step_sarc_extract)
+
+    subparser_sarc_list = subparsers.add_parser(
+        "sarc_list", help="List contents of SARC archive"
+    )
+    subparser_sarc_list.add_argument(
+        "-s", "--hide_sizes", action="store_true", help="Hide sizes of files"
+    )
+    subparser_sarc_list.set_defaults(func=step_sarc_list)
+
+    subparser_sarc_update = subparsers.add_parser(
+        "sarc_update", help="Update a SARC archive from a folder"
+    )
+    subparser_sarc_update.add_argument(
+        "folder",
+        type=Path,
+        help="Folder (or delta archive created by 'sarc delta') to update the SARC from",
+    )
+    subparser_sarc_update.set_defaults(func=step_sarc_update)
+
+    subparser_sarc_remove = subparsers.add_parser(
+        "sarc_remove", help="Remove files from SARC"
+    )
+    subparser_sarc_remove.add_argument(
+        "files", type=str, nargs="+", help="Files to remove from the SARC"
+    )
+    subparser_sarc_remove.set_defaults(func=step_sarc_remove)
+
+    subparser_byml_to_yml = subparsers.add_parser(
+        "byml_to_yml", help="Convert BYML to YML"
+    )
+    subparser_byml_to_yml.set_defaults(func=step_byml_to_yml)
+
+    subparser_yml_to_byml = subparsers.add_parser(
+        "yml_to_byml", help="Convert YML to BYML"
+    )
+    subparser_yml_to_byml.add_argument(
+        "-b", "--big_endian", action="store_true", help="Use big endian (Wii U)"
+    )
+    subparser_yml_to_byml.set_defaults(func=step_yml_to_byml)
+
+    subparser_actorinfo_get = subparsers.add_parser(
+        "actorinfo_get", help="Get entry from ActorInfo"
+    )
+    subparser_actorinfo_get.add_argument(
+        "entry_name", type=str, help="Name of the entry"
+    )
+    subparser_actorinfo_get.add_argument("key", type=str, nargs="?", help="Key")
+    subparser_actorinfo_get.set_defaults(func=step_actorinfo_get)
+
+    subparser_actorinfo_duplicate = subparsers.add_parser(
+        "actorinfo_duplicate", help="Duplicate an entry in ActorInfo"
+    )
+    subparser_actorinfo_duplicate.add_argument(
+        "entry_name_from", type=str, help="Name of the entry to duplicate from"
+    )
+    subparser_actorinfo_duplicate.add_argument(
+        "entry_name_to", type=str, help="Name of the entry to duplicate to"
+    )
+    subparser_actorinfo_duplicate.set_defaults(func=step_actorinfo_duplicate)
+
+    subparser_actorinfo_edit = subparsers.add_parser(
+        "actorinfo_edit", help="Edit ActorInfo entry"
+    )
+    subparser_actorinfo_edit.add_argument(
+        "entry_name", type=str, help="Name of the entry to edit"
+    )
+    subparser_actorinfo_edit.add_argument("key", type=str, help="Key to edit")
+    subparser_actorinfo_edit.add_argument("value", help="Value")
+    subparser_actorinfo_edit.set_defaults(func=step_actorinfo_edit)
+
+    subparser_actorinfo_remove = subparsers.add_parser(
+        "actorinfo_remove", help="Remove an entry from ActorInfo"
+    )
+    subparser_actorinfo_remove.add_argument(
+        "entry_name", type=str, help="Name of the entry to remove"
+    )
+    subparser_actorinfo_remove.add_argument(
+        "key", type=str, nargs="?", help="Name of the key to remove (entry stays)"
+    )
+    subparser_actorinfo_remove.set_defaults(func=step_actorinfo_remove)
+
+    return parser
+
+
+def split_steps(tokens: List[str]) -> List[List[str]]:
+    steps: List[List[str]] = [[]]
+
+    for token in tokens:
+        if token == "+":
+            steps.append([])
+            continue
+        steps[-1].append(token)
+
+    if not all(steps):
+        raise SystemExit("Empty pipeline step")
+
+    return steps
+
+
+def run(
+    ctx: argparse.Namespace, steps: List[argparse.Namespace], src: Path
+) -> Optional[Value]:
+    for step in steps[:-1]:
+        if step.func is step_sarc_extract:
+            raise SystemExit(f"'{step.step}' must be the last step")
+
+    for step in steps[1:]:
+        if step.func is step_sarc_create:
+            raise SystemExit(f"'{step.step}' must be the first step")
+
+    # 'sarc_create' builds from the source folder instead of reading it
+    value: Optional[Value] = src if steps[0].func is step_sarc_create else read(src)
+
+    for step in steps:
+        value = step.func(ctx, step, value)
+
+    return value
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run several operations on a file in a single process",
+        epilog="Steps are separated by '+', "
+        "ex. 'botw -o Empty.sbactorpack X.sbactorpack unyaz + sarc_remove \\* + yaz'. "
+        "Use 'botw - STEP --help' to see the arguments of a step.",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        dest="dst",
+        type=Path,
+        help="Destination file (writes to stdout if empty or '-')",
+    )
+    parser.add_argument(
+        "src",
+        type=Path,
+        help="Source file (reads from stdin if '-'), or folder for 'sarc_create'",
+    )
+    parser.add_argument(
+        "steps", nargs=argparse.REMAINDER, help="Steps separated by '+'"
+    )
+
+    args = parser.parse_args()
+
+    if not args.steps:
+        parser.error("no steps given")
+
+    step_args = step_parser()
+    args.steps = [step_args.parse_args(step) for step in split_steps(args.steps)]
+
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    ctx = argparse.Namespace(
+        verbose=bool(args.dst and args.dst.name != "-"),
+        name=args.src.name,
+        yaz0=False,
+        binary=False,
+        big_endian=False,
+    )
+
+    value = run(ctx, args.steps, args.src)
+
+    if value is None:
+        return
+
+    data = (
+        dump_actorinfo(ctx, value)
+        if isinstance(value, oead.byml.Hash)
+        else as_bytes(ctx, value)
+    )
+
+    write(data=data, src=None, dst=args.dst, condition=None, function=None)
+    return
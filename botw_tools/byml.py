@@ -1,9 +1,11 @@
 import argparse
 from pathlib import Path
+from typing import Any, Dict, List, Union
 
 import oead
 
 from .common import read, write
+from .diff import build, compare, write_changes
 
 
 def guess_dst(_byml: bool, dst: Path) -> Path:
@@ -27,6 +29,12 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "-b", "--big_endian", action="store_true", help="Use big endian (Wii U)"
     )
+    parser.add_argument(
+        "-d",
+        "--diff",
+        action="store_true",
+        help="List differences between src and dst by path instead of converting",
+    )
     parser.add_argument(
         "src",
         type=Path,
@@ -37,7 +45,7 @@ def parse_args() -> argparse.Namespace:
         "dst",
         type=Path,
         nargs="?",
-        help="Destination AAMP or YML file (writes to stdout if empty or '-', '!!' to guess filename)",
+        help="Destination BYML or YML file (writes to stdout if empty or '-', '!!' to guess filename, file to compare with when using --diff)",
     )
 
     return parser.parse_args()
@@ -67,8 +75,49 @@ def yml_to_byml(args: argparse.Namespace, data: bytes) -> None:
     return
 
 
+def load_byml(data: bytes) -> Any:
+    data = oead.yaz0.decompress(data) if data[:4] == b"Yaz0" else data
+
+    if data[:2] in (b"BY", b"YB"):
+        return oead.byml.from_binary(data)
+
+    return oead.byml.from_text(data.decode("utf-8"))
+
+
+def byml_children(value: Any) -> Union[None, List[Any], Dict[Any, Any]]:
+    if isinstance(value, oead.byml.Hash):
+        return dict(value)
+
+    if isinstance(value, oead.byml.Array):
+        return list(value)
+
+    return None
+
+
+def byml_text(value: Any) -> str:
+    if isinstance(value, (oead.byml.Hash, oead.byml.Array)):
+        return type(value).__name__
+
+    return repr(value)
+
+
+def byml_diff(args: argparse.Namespace) -> None:
+    if not args.dst or args.dst.name in ("-", "!!"):
+        raise SystemExit("You have to specify a file to compare with")
+
+    a = build(load_byml(read(args.src)), "", byml_children)
+    b = build(load_byml(read(args.dst)), "", byml_children)
+
+    write_changes(compare(a, b), byml_text)
+    return
+
+
 def main() -> None:
     args = parse_args()
+
+    if args.diff:
+        return byml_diff(args)
+
     data = read(args.src)
     data = oead.yaz0.decompress(data) if data[:4] == b"Yaz0" else data
 
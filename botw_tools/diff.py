@@ -0,0 +1,150 @@
+import difflib
+import hashlib
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+
+from .common import write_stdout
+
+
+class Node(NamedTuple):
+    digest: bytes
+    value: Any
+    # None for leaves, a list for sequences and a dict for mappings
+    children: Union[None, List["Node"], Dict[Any, "Node"]]
+    label: str
+
+
+class Change(NamedTuple):
+    op: str
+    path: str
+    old: Any
+    new: Any
+
+
+# Returns None for leaves, a list of values for sequences
+# or a dict of keys to values for mappings
+Children = Callable[[Any], Union[None, List[Any], Dict[Any, Any]]]
+
+
+def make_node(
+    value: Any,
+    label: str,
+    children: Union[None, List[Node], Dict[Any, Node]],
+    text: Callable[[Any], str] = repr,
+) -> Node:
+    h = hashlib.blake2b(digest_size=16)
+
+    if children is None:
+        # 'text' has to be stable for equal values (no object addresses)
+        h.update(b"L" + text(value).encode("utf-8"))
+    elif isinstance(children, list):
+        h.update(b"S" + type(value).__name__.encode("utf-8"))
+        for child in children:
+            h.update(child.digest)
+    else:
+        h.update(b"M" + type(value).__name__.encode("utf-8"))
+        for key in sorted(children, key=repr):
+            h.update(repr(key).encode("utf-8") + b"\0" + children[key].digest)
+
+    return Node(h.digest(), value, children, label)
+
+
+def build(
+    value: Any,
+    label: str,
+    get_children: Children,
+    text: Callable[[Any], str] = repr,
+) -> Node:
+    children = get_children(value)
+
+    if children is None:
+        return make_node(value, label, None, text)
+
+    if isinstance(children, list):
+        return make_node(
+            value,
+            label,
+            [build(c, f"[{i}]", get_children, text) for i, c in enumerate(children)],
+        )
+
+    return make_node(
+        value,
+        label,
+        {k: build(v, str(k), get_children, text) for k, v in children.items()},
+    )
+
+
+def join(path: str, label: str) -> str:
+    if not path or label.startswith("["):
+        return f"{path}{label}"
+    return f"{path}/{label}"
+
+
+def compare(
+    a: Node, b: Node, path: str = "", changes: Optional[List[Change]] = None
+) -> List[Change]:
+    """Compare two trees, subtrees with the same digest are skipped without descending."""
+    changes = [] if changes is None else changes
+
+    if a.digest == b.digest:
+        return changes
+
+    if (
+        a.children is None
+        or b.children is None
+        or type(a.children) is not type(b.children)
+        or type(a.value) is not type(b.value)
+    ):
+        changes.append(Change("~", path, a.value, b.value))
+        return changes
+
+    if isinstance(a.children, list):
+        compare_sequences(a.children, b.children, path, changes)
+        return changes
+
+    for key, child in a.children.items():
+        if key not in b.children:
+            changes.append(Change("-", join(path, child.label), child.value, None))
+        else:
+            compare(child, b.children[key], join(path, b.children[key].label), changes)
+
+    for key, child in b.children.items():
+        if key not in a.children:
+            changes.append(Change("+", join(path, child.label), None, child.value))
+
+    return changes
+
+
+def compare_sequences(
+    a: List[Node], b: List[Node], path: str, changes: List[Change]
+) -> None:
+    # Matching on digests lines up unchanged items even if some were inserted or removed
+    matcher = difflib.SequenceMatcher(
+        None, [n.digest for n in a], [n.digest for n in b], autojunk=False
+    )
+
+    for op, a_start, a_end, b_start, b_end in matcher.get_opcodes():
+        if op == "equal":
+            continue
+
+        paired = min(a_end - a_start, b_end - b_start) if op == "replace" else 0
+
+        for i in range(paired):
+            compare(a[a_start + i], b[b_start + i], f"{path}[{b_start + i}]", changes)
+
+        for i in range(a_start + paired, a_end):
+            changes.append(Change("-", f"{path}[{i}]", a[i].value, None))
+
+        for i in range(b_start + paired, b_end):
+            changes.append(Change("+", f"{path}[{i}]", None, b[i].value))
+    return
+
+
+def write_changes(changes: List[Change], text: Callable[[Any], str]) -> None:
+    for change in changes:
+        path = change.path or "/"
+        if change.op == "~":
+            line = f"~ {path}: {text(change.old)} -> {text(change.new)}"
+        else:
+            line = f"{change.op} {path}"
+        write_stdout(f"{line}\n".encode("utf-8"))
+    return
@@ -1,14 +1,20 @@
 import argparse
+import hashlib
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
 import oead
 
 from .common import read, write, write_stdout
+from .diff import Change, write_changes
 
+# Members of a delta archive listing the files to remove and the hashes
+# of the changed and removed files in the archive the delta applies to
+DELTA_REMOVED = ".removed"
+DELTA_BASE = ".base"
 
-def read_sarc(src: Path) -> oead.Sarc:
-    data = read(src=src)
+
+def parse_sarc(data: bytes) -> oead.Sarc:
     data = oead.yaz0.decompress(data) if data[:4] == b"Yaz0" else data
 
     if data[:4] != b"SARC":
@@ -17,21 +23,31 @@ def read_sarc(src: Path) -> oead.Sarc:
     return oead.Sarc(data)
 
 
+def read_sarc(src: Path) -> oead.Sarc:
+    return parse_sarc(read(src=src))
+
+
 def write_sarc(sarc: oead.SarcWriter, dst: Path) -> int:
     return write(data=sarc.write()[1], src=None, dst=dst, condition=None, function=None)
 
 
-def sarc_create(args: argparse.Namespace) -> None:
+def create_files(folder: Path, big_endian: bool) -> oead.SarcWriter:
     sarc = oead.SarcWriter(
-        oead.Endianness.Big if args.big_endian else oead.Endianness.Little
+        oead.Endianness.Big if big_endian else oead.Endianness.Little
     )
 
-    if args.folder.name == "-":
+    if folder.name == "-":
         raise SystemExit("You cannot pipe in a folder")
 
-    for f in args.folder.glob("**/*.*"):
+    for f in folder.glob("**/*.*"):
         if f.is_file():
-            sarc.files[f.as_posix()[len(args.folder.as_posix()) + 1 :]] = f.read_bytes()
+            sarc.files[f.as_posix()[len(folder.as_posix()) + 1 :]] = f.read_bytes()
+
+    return sarc
+
+
+def sarc_create(args: argparse.Namespace) -> None:
+    sarc = create_files(args.folder, args.big_endian)
 
     if args.sarc and args.sarc.name == "!!":
         args.sarc = args.folder.with_suffix(".pack")
@@ -55,36 +71,41 @@ def sarc_extract(args: argparse.Namespace) -> None:
             "Destination directory cannot be '!!' when using input from pipe"
         )
 
+    extract_files(sarc, base, args.simple)
+    return
+
+
+def extract_files(sarc: oead.Sarc, base: Path, simple: bool) -> None:
     for file in sarc.get_files():
         path = base / file.name
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_bytes(file.data)
         dst_str = path.absolute().as_posix()[len(Path.cwd().as_posix()) + 1 :]
         write_stdout(
-            (f"{dst_str}\n" if args.simple else f"Written '{dst_str}'\n").encode(
-                "utf-8"
-            )
+            (f"{dst_str}\n" if simple else f"Written '{dst_str}'\n").encode("utf-8")
         )
     return
 
 
 def sarc_list(args: argparse.Namespace) -> None:
-    sarc = read_sarc(args.sarc)
-
-    files: List[oead.File] = [f for f in sarc.get_files()]
+    listing = list_files(read_sarc(args.sarc), args.hide_sizes)
 
-    if files:
-        for file in files:
-            write_stdout(
-                f"{file.name}{f' [{hex(len(file.data))} bytes]' if not args.hide_sizes else ''}\n".encode(
-                    "utf-8"
-                )
-            )
+    if listing:
+        write_stdout(listing.encode("utf-8"))
         return
 
     raise SystemExit(f"No files inside '{args.sarc.name if args.sarc else '-'}'")
 
 
+def list_files(sarc: oead.Sarc, hide_sizes: bool) -> str:
+    files: List[oead.File] = [f for f in sarc.get_files()]
+
+    return "".join(
+        f"{file.name}{f' [{hex(len(file.data))} bytes]' if not hide_sizes else ''}\n"
+        for file in files
+    )
+
+
 def sarc_update(args: argparse.Namespace) -> None:
     # noinspection PyArgumentList
     sarc = oead.SarcWriter.from_sarc(read_sarc(args.sarc))
@@ -92,16 +113,148 @@ def sarc_update(args: argparse.Namespace) -> None:
     if not args.folder or args.folder.name == "-":
         raise SystemExit("You cannot pipe in a folder")
 
-    files = [f for f in args.folder.glob("**/*.*")]
+    update_from(sarc, args.folder, bool(args.sarc and args.sarc.name != "-"))
+    write_sarc(sarc, args.sarc)
+    return
+
+
+def update_from(sarc: oead.SarcWriter, src: Path, verbose: bool) -> None:
+    if src.is_file():
+        return apply_delta(sarc, read_sarc(src), verbose)
+
+    return update_files(sarc, src, verbose)
+
+
+def update_files(sarc: oead.SarcWriter, folder: Path, verbose: bool) -> None:
+    files = [f for f in folder.glob("**/*.*")]
 
     for f in files:
-        key = f.as_posix()[len(args.folder.as_posix()) + 1 :]
+        key = f.as_posix()[len(folder.as_posix()) + 1 :]
         write_stdout(
             f"{'Updated' if key in sarc.files else 'Added'} '{key}'\n".encode("utf-8")
-        ) if args.sarc and args.sarc.name != "-" else None
+        ) if verbose else None
         sarc.files[key] = f.read_bytes()
+    return
 
-    write_sarc(sarc, args.sarc)
+
+def check_delta(sarc: oead.SarcWriter, delta: oead.Sarc) -> None:
+    base_file = delta.get_file(DELTA_BASE)
+
+    if base_file is None:
+        raise SystemExit("Not a delta archive created by 'sarc delta'")
+
+    base: Dict[str, str] = {}
+    for line in bytes(base_file.data).decode("utf-8").splitlines():
+        digest, name = line.split(" ", 1)
+        base[name] = digest
+
+    for name, digest in base.items():
+        if name not in sarc.files or hash_data(sarc.files[name]).hex() != digest:
+            raise SystemExit(f"The delta doesn't apply to this SARC ('{name}' differs)")
+
+    for file in delta.get_files():
+        if (
+            file.name not in (DELTA_BASE, DELTA_REMOVED, *base)
+            and file.name in sarc.files
+        ):
+            raise SystemExit(
+                f"The delta doesn't apply to this SARC ('{file.name}' already exists)"
+            )
+    return
+
+
+def apply_delta(sarc: oead.SarcWriter, delta: oead.Sarc, verbose: bool) -> None:
+    check_delta(sarc, delta)
+
+    for file in delta.get_files():
+        if file.name == DELTA_BASE:
+            continue
+
+        if file.name == DELTA_REMOVED:
+            for name in bytes(file.data).decode("utf-8").splitlines():
+                if name in sarc.files:
+                    del sarc.files[name]
+                    write_stdout(
+                        f"Removed '{name}'\n".encode("utf-8")
+                    ) if verbose else None
+            continue
+
+        write_stdout(
+            f"{'Updated' if file.name in sarc.files else 'Added'} '{file.name}'\n".encode(
+                "utf-8"
+            )
+        ) if verbose else None
+        sarc.files[file.name] = bytes(file.data)
+    return
+
+
+def hash_data(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def hash_files(sarc: oead.Sarc) -> Dict[str, Tuple[bytes, int]]:
+    return {
+        f.name: (hash_data(f.data), len(f.data))
+        for f in sarc.get_files()
+    }
+
+
+def compare_sarcs(a: oead.Sarc, b: oead.Sarc) -> List[Change]:
+    files_a = hash_files(a)
+    files_b = hash_files(b)
+    changes: List[Change] = []
+
+    for name in sorted(files_a.keys() | files_b.keys()):
+        if name not in files_b:
+            changes.append(Change("-", name, files_a[name][1], None))
+        elif name not in files_a:
+            changes.append(Change("+", name, None, files_b[name][1]))
+        elif files_a[name][0] != files_b[name][0]:
+            changes.append(Change("~", name, files_a[name][1], files_b[name][1]))
+
+    return changes
+
+
+def read_sarcs(args: argparse.Namespace) -> Tuple[oead.Sarc, oead.Sarc]:
+    if args.other.name == "-" and (not args.sarc or args.sarc.name == "-"):
+        raise SystemExit("You cannot pipe in both archives")
+
+    return read_sarc(args.sarc), read_sarc(args.other)
+
+
+def sarc_diff(args: argparse.Namespace) -> None:
+    write_changes(compare_sarcs(*read_sarcs(args)), lambda size: f"{hex(size)} bytes")
+    return
+
+
+def sarc_delta(args: argparse.Namespace) -> None:
+    a, b = read_sarcs(args)
+
+    for name in (DELTA_REMOVED, DELTA_BASE):
+        if b.get_file(name) is not None:
+            raise SystemExit(f"'{name}' is reserved for the delta metadata")
+
+    files_a = hash_files(a)
+    changes = compare_sarcs(a, b)
+    delta = oead.SarcWriter(b.get_endianness())
+
+    # Hashes of the files the delta replaces or removes, to check the base archive
+    delta.files[DELTA_BASE] = "".join(
+        f"{files_a[c.path][0].hex()} {c.path}\n" for c in changes if c.op != "+"
+    ).encode("utf-8")
+
+    for change in changes:
+        if change.op != "-":
+            delta.files[change.path] = bytes(b.get_file(change.path).data)
+
+    removed = [change.path for change in changes if change.op == "-"]
+    if removed:
+        delta.files[DELTA_REMOVED] = "\n".join(removed).encode("utf-8")
+
+    if args.delta and args.delta.name != "-":
+        write_changes(changes, lambda size: f"{hex(size)} bytes")
+
+    write_sarc(delta, args.delta)
     return
 
 
@@ -112,20 +265,20 @@ def sarc_remove(args: argparse.Namespace) -> None:
     if "-" in args.files:
         raise SystemExit("You cannot pipe in filenames to remove")
 
-    if "*" in args.files:
+    remove_files(sarc, args.files, bool(args.sarc and args.sarc.name != "-"))
+    write_sarc(sarc, args.sarc)
+    return
+
+
+def remove_files(sarc: oead.SarcWriter, files: List[str], verbose: bool) -> None:
+    if "*" in files:
         sarc.files.clear()
-        write_stdout(
-            f"Removed all files\n".encode("utf-8")
-        ) if args.sarc and args.sarc.name != "-" else None
-    else:
-        for file in sarc.files:
-            if file in args.files:
-                del sarc.files[file]
-                write_stdout(
-                    f"Removed '{file}'\n".encode("utf-8")
-                ) if args.sarc and args.sarc.name != "-" else None
+        write_stdout(f"Removed all files\n".encode("utf-8")) if verbose else None
+        return
 
-    write_sarc(sarc, args.sarc)
+    for file in [f for f in sarc.files if f in files]:
+        del sarc.files[file]
+        write_stdout(f"Removed '{file}'\n".encode("utf-8")) if verbose else None
     return
 
 
@@ -196,7 +349,9 @@ def parse_args() -> argparse.Namespace:
         help="SARC to update (reads from stdin if empty or '-', result will be written to stdout)",
     )
     subparser_update.add_argument(
-        "folder", type=Path, help="Folder to update the SARC from"
+        "folder",
+        type=Path,
+        help="Folder (or delta archive created by 'sarc delta') to update the SARC from",
     )
     subparser_update.set_defaults(func=sarc_update)
 
@@ -214,6 +369,36 @@ def parse_args() -> argparse.Namespace:
     )
     subparser_remove.set_defaults(func=sarc_remove)
 
+    subparser_diff = subparsers.add_parser(
+        "diff", help="List added, removed and changed files", aliases=["df"]
+    )
+    subparser_diff.add_argument(
+        "sarc",
+        type=Path,
+        help="Original SARC (reads from stdin if '-')",
+    )
+    subparser_diff.add_argument("other", type=Path, help="SARC to compare with")
+    subparser_diff.set_defaults(func=sarc_diff)
+
+    subparser_delta = subparsers.add_parser(
+        "delta",
+        help="Create a SARC with only the files needed to turn one SARC into another",
+        aliases=["dt"],
+    )
+    subparser_delta.add_argument(
+        "sarc",
+        type=Path,
+        help="Original SARC (reads from stdin if '-')",
+    )
+    subparser_delta.add_argument("other", type=Path, help="Updated SARC")
+    subparser_delta.add_argument(
+        "delta",
+        type=Path,
+        nargs="?",
+        help="Destination delta SARC (writes to stdout if empty or '-'), apply it with 'sarc update'",
+    )
+    subparser_delta.set_defaults(func=sarc_delta)
+
     return parser.parse_args()
 
 
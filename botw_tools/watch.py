@@ -0,0 +1,551 @@
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+import oead
+
+from . import aamp, byml
+from .common import write, write_stdout
+from .sarc import parse_sarc
+
+SARC_SUFFIXES = {
+    "sarc",
+    "pack",
+    "bactorpack",
+    "bmodelsh",
+    "beventpack",
+    "blarc",
+    "bfarc",
+    "bgenvb",
+    "stera",
+    "stats",
+}
+BYML_SUFFIXES = {"byml", "mubin"}
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+
+
+def is_pack(path: Path) -> bool:
+    suffix = path.suffix[1:]
+    return suffix in SARC_SUFFIXES or (
+        suffix[:1] == "s" and suffix[1:] in SARC_SUFFIXES
+    )
+
+
+def is_compressed(path: Path) -> bool:
+    suffix = path.suffix[1:]
+    return suffix[:1] == "s" and suffix[1:] in SARC_SUFFIXES | BYML_SUFFIXES
+
+
+def is_ignored(path: Path) -> bool:
+    return any(part.startswith(".") or part.endswith("~") for part in path.parts)
+
+
+def convert(path: Path, big_endian: bool) -> Tuple[str, bytes]:
+    data = path.read_bytes()
+
+    if path.suffix != ".yml":
+        return path.name, data
+
+    if data[:3] == b"!io":
+        dst = aamp.guess_dst(True, path)
+        # noinspection PyArgumentList
+        data = oead.aamp.ParameterIO.from_text(data.decode("utf-8")).to_binary()
+    else:
+        dst = byml.guess_dst(True, path)
+        data = oead.byml.to_binary(
+            oead.byml.from_text(data.decode("utf-8")), big_endian
+        )
+
+    return dst.name, oead.yaz0.compress(data) if is_compressed(dst) else data
+
+
+class Target(NamedTuple):
+    # Source folders of the packs containing the file, outermost first
+    packs: Tuple[Path, ...]
+    name: str
+
+
+class Builder:
+    """Keeps track of which source file ends up in which (nested) pack and output file.
+
+    Packs are loaded lazily (from the already built output, or from their parent pack)
+    and kept in memory, so a change only rebuilds the member and the packs containing it.
+    """
+
+    def __init__(self, src: Path, dst: Path, big_endian: bool) -> None:
+        self.src = src
+        self.dst = dst
+        self.big_endian = big_endian
+        self.deps: Dict[Path, Target] = {}
+        self.packs: Dict[Path, oead.SarcWriter] = {}
+
+    def pack_chain(self, path: Path) -> Tuple[Path, ...]:
+        return tuple(
+            p for p in reversed(path.parents) if self.src in p.parents and is_pack(p)
+        )
+
+    def key(self, pack: Path, path: Path, name: str) -> str:
+        return (path.parent.relative_to(pack) / name).as_posix()
+
+    def output(self, path: Path, name: str) -> Path:
+        return self.dst / path.parent.relative_to(self.src) / name
+
+    def target(self, path: Path) -> Target:
+        name = path.name
+
+        if path.suffix == ".yml":
+            with path.open("rb") as f:
+                header = f.read(3)
+            name = (
+                aamp.guess_dst(True, path)
+                if header == b"!io"
+                else byml.guess_dst(True, path)
+            ).name
+
+        return Target(self.pack_chain(path), name)
+
+    def build_pack(self, pack: Path) -> oead.SarcWriter:
+        sarc = oead.SarcWriter(
+            oead.Endianness.Big if self.big_endian else oead.Endianness.Little
+        )
+        nested: Set[Path] = set()
+
+        for path, target in self.deps.items():
+            if pack not in target.packs:
+                continue
+
+            depth = target.packs.index(pack)
+
+            if depth == len(target.packs) - 1:
+                try:
+                    sarc.files[self.key(pack, path, target.name)] = convert(
+                        path, self.big_endian
+                    )[1]
+                except Exception as e:
+                    self.failed(path, e)
+            elif target.packs[depth + 1] not in nested:
+                nested.add(target.packs[depth + 1])
+
+        for p in nested:
+            sarc.files[self.key(pack, p, p.name)] = self.dump_pack(
+                p, self.build_pack(p)
+            )
+
+        self.packs[pack] = sarc
+        return sarc
+
+    def get_pack(self, pack: Path) -> oead.SarcWriter:
+        if pack in self.packs:
+            return self.packs[pack]
+
+        parents = self.pack_chain(pack)
+
+        if parents:
+            parent = self.get_pack(parents[-1])
+            key = self.key(parents[-1], pack, pack.name)
+            data = parent.files[key] if key in parent.files else None
+        else:
+            out = self.output(pack, pack.name)
+            data = out.read_bytes() if out.is_file() else None
+
+        if data is None:
+            return self.build_pack(pack)
+
+        # noinspection PyArgumentList
+        sarc = oead.SarcWriter.from_sarc(parse_sarc(bytes(data)))
+
+        # Sources could have been removed while nothing was watching them
+        for key in [k for k in sarc.files if k not in self.members(pack)]:
+            del sarc.files[key]
+            write_stdout(f"Removed '{key}'\n".encode("utf-8"))
+
+        self.packs[pack] = sarc
+        return sarc
+
+    def members(self, pack: Path) -> Set[str]:
+        members: Set[str] = set()
+
+        for path, target in self.deps.items():
+            if pack not in target.packs:
+                continue
+
+            depth = target.packs.index(pack)
+
+            if depth == len(target.packs) - 1:
+                members.add(self.key(pack, path, target.name))
+            else:
+                nested = target.packs[depth + 1]
+                members.add(self.key(pack, nested, nested.name))
+
+        return members
+
+    def dump_pack(self, pack: Path, sarc: oead.SarcWriter) -> bytes:
+        data = sarc.write()[1]
+        return oead.yaz0.compress(data) if is_compressed(pack) else data
+
+    def forget(self, pack: Path) -> None:
+        for p in [p for p in self.packs if p == pack or pack in p.parents]:
+            del self.packs[p]
+        return
+
+    def scan(self) -> None:
+        units: Dict[Path, int] = {}
+
+        for path in sorted(self.src.rglob("*")):
+            if is_ignored(path.relative_to(self.src)):
+                continue
+
+            if path.is_dir():
+                # Removing a file only changes the mtime of its folder
+                packs = self.pack_chain(path) + ((path,) if is_pack(path) else ())
+                if packs:
+                    units[packs[0]] = max(
+                        units.get(packs[0], 0), path.stat().st_mtime_ns
+                    )
+                continue
+
+            if not path.is_file():
+                continue
+
+            try:
+                target = self.target(path)
+            except Exception as e:
+                self.failed(path, e)
+                continue
+
+            self.deps[path] = target
+            unit = target.packs[0] if target.packs else path
+            units[unit] = max(units.get(unit, 0), path.stat().st_mtime_ns)
+
+        for unit, mtime in units.items():
+            out = self.output(
+                unit, self.deps[unit].name if unit in self.deps else unit.name
+            )
+
+            if out.is_file() and out.stat().st_mtime_ns >= mtime:
+                continue
+
+            try:
+                if unit in self.deps:
+                    self.write_file(unit)
+                else:
+                    self.write_output(unit, self.dump_pack(unit, self.build_pack(unit)))
+            except Exception as e:
+                self.failed(unit, e)
+        return
+
+    def failed(self, path: Path, e: Exception) -> None:
+        write_stdout(f"Failed to build '{path.name}': {e}\n".encode("utf-8"))
+        return
+
+    def write_file(self, path: Path) -> None:
+        name, data = convert(path, self.big_endian)
+        write(
+            data=data,
+            src=None,
+            dst=self.output(path, name),
+            condition=None,
+            function=None,
+        )
+        return
+
+    def write_output(self, pack: Path, data: bytes) -> None:
+        write(
+            data=data,
+            src=None,
+            dst=self.output(pack, pack.name),
+            condition=None,
+            function=None,
+        )
+        return
+
+    def remove_output(self, path: Path, name: str) -> None:
+        out = self.output(path, name)
+
+        if out.is_file():
+            out.unlink()
+            write_stdout(f"Removed '{out.name}'\n".encode("utf-8"))
+        return
+
+    def rebuild(self, changed: Set[Path]) -> None:
+        sources: Set[Path] = set()
+
+        for path in changed:
+            if path != self.src and self.src not in path.parents:
+                continue
+
+            if path.is_dir():
+                sources.update(p for p in path.rglob("*") if p.is_file())
+            elif path.is_file():
+                sources.add(path)
+
+            # Removed files (or files inside a removed folder)
+            sources.update(s for s in self.deps if s == path or path in s.parents)
+
+        dirty: Set[Path] = set()
+
+        for path in sorted(sources):
+            if is_ignored(path.relative_to(self.src)):
+                continue
+
+            old = self.deps.get(path)
+
+            if not path.is_file() and not old:
+                continue
+
+            # Marked before building, loading a pack prunes stale members and the
+            # old member could already be removed even if the conversion fails
+            dirty.update(self.pack_chain(path)[-1:])
+            dirty.update(old.packs[-1:] if old else ())
+
+            try:
+                if path.is_file():
+                    self.deps[path] = self.update(path, old)
+                else:
+                    self.remove(path, old)
+                    del self.deps[path]
+            except Exception as e:
+                self.failed(path, e)
+
+        # Deepest packs first, so every pack is written only once
+        while dirty:
+            pack = max(dirty, key=lambda p: len(p.parts))
+            dirty.remove(pack)
+            parents = self.pack_chain(pack)
+
+            if not parents:
+                if pack.is_dir():
+                    self.write_output(pack, self.dump_pack(pack, self.get_pack(pack)))
+                else:
+                    self.remove_output(pack, pack.name)
+                    self.forget(pack)
+                continue
+
+            parent = self.get_pack(parents[-1])
+            key = self.key(parents[-1], pack, pack.name)
+
+            if pack.is_dir():
+                parent.files[key] = self.dump_pack(pack, self.get_pack(pack))
+            elif key in parent.files:
+                del parent.files[key]
+                self.forget(pack)
+            dirty.add(parents[-1])
+        return
+
+    def update(self, path: Path, old: Optional[Target]) -> Target:
+        target = self.target(path)
+
+        if old and old != target:
+            self.remove(path, old)
+
+        if not target.packs:
+            self.write_file(path)
+            return target
+
+        pack = target.packs[-1]
+        sarc = self.get_pack(pack)
+        key = self.key(pack, path, target.name)
+        data = convert(path, self.big_endian)[1]
+
+        write_stdout(
+            f"{'Updated' if key in sarc.files else 'Added'} '{key}'\n".encode("utf-8")
+        )
+        sarc.files[key] = data
+        return target
+
+    def remove(self, path: Path, old: Target) -> None:
+        if not old.packs:
+            self.remove_output(path, old.name)
+            return
+
+        pack = old.packs[-1]
+        sarc = self.get_pack(pack)
+        key = self.key(pack, path, old.name)
+
+        if key in sarc.files:
+            del sarc.files[key]
+            write_stdout(f"Removed '{key}'\n".encode("utf-8"))
+        return
+
+
+class InotifyWatcher:
+    def __init__(self, root: Path) -> None:
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.root = root
+        self.wds: Dict[int, Path] = {}
+        self.add_watches(root)
+
+    def add_watches(self, folder: Path) -> None:
+        for path in [folder, *(p for p in folder.rglob("*") if p.is_dir())]:
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), IN_MASK)
+            if wd >= 0:
+                self.wds[wd] = path
+        return
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+
+        buf = os.read(self.fd, 0x10000)
+        changed: Set[Path] = set()
+        offset = 0
+
+        while offset < len(buf):
+            wd, mask, _, length = struct.unpack_from("iIII", buf, offset)
+            name = buf[offset + 16 : offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, everything has to be considered changed
+                changed.add(self.root)
+                continue
+
+            if mask & IN_IGNORED:
+                self.wds.pop(wd, None)
+                continue
+
+            if wd not in self.wds:
+                continue
+
+            path = self.wds[wd] / os.fsdecode(name) if name else self.wds[wd]
+            changed.add(path)
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_watches(path)
+
+        return changed
+
+
+class PollingWatcher:
+    def __init__(self, root: Path, interval: float) -> None:
+        self.root = root
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+
+        for path in self.root.rglob("*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.is_file():
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        while True:
+            # While debouncing, poll every 'timeout' seconds instead of the interval
+            time.sleep(self.interval if timeout is None else timeout)
+            snapshot = self.scan()
+            changed = {
+                p
+                for p in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(p) != self.snapshot.get(p)
+            }
+            self.snapshot = snapshot
+
+            if changed or timeout is not None:
+                return changed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Watch a folder and rebuild changed files and packs",
+        epilog="Folders named like a SARC archive (ex. 'Foo.sbactorpack') are built into "
+        "that archive, YML files are converted to AAMP or BYML",
+    )
+
+    parser.add_argument(
+        "-b", "--big_endian", action="store_true", help="Use big endian (Wii U)"
+    )
+    parser.add_argument(
+        "-p",
+        "--poll",
+        action="store_true",
+        help="Poll for changes instead of using inotify",
+    )
+    parser.add_argument(
+        "-i",
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Polling interval in seconds (default: 1.0)",
+    )
+    parser.add_argument(
+        "-d",
+        "--delay",
+        type=float,
+        default=0.2,
+        help="Wait until there are no changes for this many seconds (default: 0.2)",
+    )
+    parser.add_argument("src", type=Path, help="Folder to watch")
+    parser.add_argument("dst", type=Path, help="Folder to write the built files to")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.src.name == "-" or not args.src.is_dir():
+        raise SystemExit(f"'{args.src.name}' doesn't exist or is not a folder")
+
+    src = args.src.resolve()
+    dst = args.dst.resolve()
+
+    if dst == src or src in dst.parents:
+        raise SystemExit("Destination folder cannot be inside the watched folder")
+
+    builder = Builder(src, dst, args.big_endian)
+    builder.scan()
+
+    watcher = None
+    if not args.poll and sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(src)
+        except (OSError, AttributeError):
+            watcher = None
+    watcher = watcher or PollingWatcher(src, args.interval)
+
+    write_stdout(f"Watching '{args.src}'\n".encode("utf-8"))
+    pending: Set[Path] = set()
+
+    try:
+        while True:
+            changed = watcher.wait(args.delay if pending else None)
+
+            if changed:
+                pending |= changed
+                continue
+
+            builder.rebuild(pending)
+            pending = set()
+    except KeyboardInterrupt:
+        raise SystemExit()
@@ -31,6 +31,8 @@ setup(
             "sarc = botw_tools.sarc:main",
             "yaz0 = botw_tools.yaz0:main",
             "actorinfo = botw_tools.actorinfo:main",
+            "botw = botw_tools.botw:main",
+            "botw_watch = botw_tools.watch:main",
         ]
     },
 )